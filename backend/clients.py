@@ -0,0 +1,35 @@
+# clients.py
+import os
+import httpx
+import redis.asyncio as aioredis
+from supabase import create_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.environ["SUPABASE_URL"]
+SUPABASE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+BUCKET_NAME = os.environ["BUCKET_NAME"]
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# One Supabase client for the whole process, shared by every router
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Shared async HTTP client for the Supabase storage API, reused across uploads
+# so connections (and their TLS sessions) are pooled instead of re-opened
+http_client = httpx.AsyncClient(
+    base_url=f"{SUPABASE_URL}/storage/v1",
+    headers={"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY},
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=50),
+    http2=True,
+    timeout=60,
+)
+
+# Redis for share links; None when REDIS_URL isn't set (see share_store.py)
+redis = aioredis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+
+async def close_clients() -> None:
+    """Close the pooled connections on shutdown"""
+    await http_client.aclose()
+    if redis is not None:
+        await redis.aclose()
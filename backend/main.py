@@ -1,10 +1,56 @@
 # main.py
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from routers import upload_router, share_router, file_router
+import clients
 
 app = FastAPI()
 
+class UploadSizeLimitMiddleware:
+    """Enforce upload_router.MAX_REQUEST_SIZES on upload request bodies.
+
+    Requests whose Content-Length is over the limit get a 413 before any of the body is read.
+    Bodies without a Content-Length (chunked) are counted as they stream in and cut off with
+    a 413 as soon as they pass the limit. Written as plain ASGI so other routes and streaming
+    responses don't pay for it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        max_size = upload_router.MAX_REQUEST_SIZES.get(scope["path"]) if scope["type"] == "http" else None
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = f"File too large. Max size: {upload_router.MAX_FILE_SIZE // (1024*1024)}MB"
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and (not content_length.isdigit() or int(content_length) > max_size):
+            response = JSONResponse(status_code=413, content={"detail": too_large})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes a 413 response
+                    raise HTTPException(status_code=413, detail=too_large)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Registered before CORSMiddleware so a 413 still carries CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +69,15 @@ app.include_router(upload_router.router)
 app.include_router(share_router.router)
 app.include_router(file_router.router)
 
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.sweep_task = asyncio.create_task(upload_router.sweep_abandoned_uploads_forever())
+
+@app.on_event("shutdown")
+async def close_clients():
+    app.state.sweep_task.cancel()
+    await clients.close_clients()
+
 @app.get("/")
 async def root():
     return {
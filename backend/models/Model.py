@@ -1,7 +1,16 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class ShareLinkResponse(BaseModel):
     share_url: str
     original_url: str
     filename: str
-    created_at: str
+    created_at: float
+
+class UploadUrlRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
+class UploadCompleteRequest(BaseModel):
+    share_id: str
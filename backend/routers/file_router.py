@@ -1,47 +1,84 @@
-import os
-from fastapi import APIRouter, HTTPException
-from supabase import create_client
-from dotenv import load_dotenv
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Body
+from typing import List
+from clients import supabase, BUCKET_NAME
 
-load_dotenv()
-
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-BUCKET_NAME = os.environ["BUCKET_NAME"]
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-from .upload_router import share_links
+from share_store import get_link, get_links, delete_link, delete_links
+
+# Max share links removed by a single /delete-batch call
+MAX_BATCH_DELETE = 100
 
 @router.delete("/delete/{share_id}")
 async def delete_file(share_id: str):
     """Delete file from Supabase storage and remove share link"""
-    if share_id not in share_links:
+    link_data = await get_link(share_id)
+    if link_data is None:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        link_data = share_links[share_id]
         file_path = link_data["path"]
         
-        # Delete from Supabase storage
-        result = supabase.storage.from_(BUCKET_NAME).remove([file_path])
+        # Delete from Supabase storage (sync SDK call, run off the event loop)
+        result = await asyncio.to_thread(supabase.storage.from_(BUCKET_NAME).remove, [file_path])
         
         # Check if deletion was successful
-        if hasattr(result, 'error') and result.error:
-            print(f"Delete error: {result.error}")
-            raise HTTPException(status_code=500, detail=f"Delete failed: {result.error}")
+        error = getattr(result, 'error', None)
+        if error:
+            logger.error("Delete error: %s", error)
+            raise HTTPException(status_code=500, detail=f"Delete failed: {error}")
         
-        # Remove from share_links dictionary
-        del share_links[share_id]
+        # Remove the share link
+        await delete_link(share_id)
         
-        print(f"Successfully deleted file: {file_path}")
+        logger.debug("Deleted file: %s", file_path)
         return {"ok": True, "message": "File deleted successfully", "share_id": share_id}
         
     except KeyError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
-        print(f"Unexpected error during deletion: {e}")
+        logger.error("Unexpected error during deletion: %s", e)
+        raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
+
+@router.post("/delete-batch")
+async def delete_files(share_ids: List[str] = Body(...)):
+    """Delete several files with a single storage call and remove their share links"""
+    if len(share_ids) > MAX_BATCH_DELETE:
+        raise HTTPException(status_code=400, detail=f"Too many files. Max {MAX_BATCH_DELETE} files per batch")
+    
+    share_ids = list(dict.fromkeys(share_ids))  # drop duplicates, keep order
+    links = await get_links(share_ids)
+    if not links:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    try:
+        file_paths = [link_data["path"] for link_data in links.values()]
+        
+        # One remove call for every path (sync SDK call, run off the event loop)
+        result = await asyncio.to_thread(supabase.storage.from_(BUCKET_NAME).remove, file_paths)
+        
+        error = getattr(result, 'error', None)
+        if error:
+            logger.error("Batch delete error: %s", error)
+            raise HTTPException(status_code=500, detail=f"Delete failed: {error}")
+        
+        await delete_links(list(links))
+        
+        logger.debug("Deleted files: %s", file_paths)
+        return {
+            "ok": True,
+            "message": "Files deleted successfully",
+            "deleted": list(links),
+            "not_found": [share_id for share_id in share_ids if share_id not in links]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error during batch deletion: %s", e)
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
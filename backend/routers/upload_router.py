@@ -1,24 +1,89 @@
-import os, io, uuid, hashlib, json
+import io, re, time, logging, uuid, secrets, json
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from supabase import create_client
-from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
 import asyncio
+import anyio
 from typing import List
+from clients import http_client, SUPABASE_URL, BUCKET_NAME
+from models.Model import UploadUrlRequest, UploadCompleteRequest
+from share_store import (
+    save_link, reserve_share_id, save_pending_upload, get_pending_upload,
+    delete_pending_upload, get_abandoned_uploads, remove_abandoned_uploads
+)
 
-load_dotenv()
-
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-BUCKET_NAME = os.environ["BUCKET_NAME"]
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-share_links = {}
+# Public object URLs are a fixed format, so build them directly instead of asking the SDK
+PUBLIC_URL_PREFIX = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/"
+
+# Runs of characters that aren't safe in a storage key (underscores included, so
+# existing runs of them collapse too) are replaced by a single underscore
+UNSAFE_FILENAME_RE = re.compile(r'(?:[^\w\-.]|_)+')
 
 # File size limit (49MB)
 MAX_FILE_SIZE = 49 * 1024 * 1024
+MAX_BATCH_FILES = 20
+
+# Starlette's multipart parser spools each uploaded file to disk once it passes 1MB. That
+# default is kept on purpose: the parser accepts up to 1000 parts per request before any
+# handler runs, so keeping parts in memory up to MAX_FILE_SIZE would let a single request
+# (or a chunked one with no Content-Length) pin gigabytes of RAM.
+
+# Size of each read from the spooled upload when streaming it to storage. Files past 1MB
+# are on disk, so every read is a threadpool hop; 1MB reads keep a 49MB file to 49 hops
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Largest request body each upload endpoint accepts, checked against Content-Length
+# before the body is read (allows for multipart boundaries and part headers)
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_REQUEST_SIZES = {
+    "/upload": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+    "/upload-multiple": MAX_BATCH_FILES * (MAX_FILE_SIZE + MULTIPART_OVERHEAD),
+}
+
+# Server-wide cap on concurrent storage uploads, shared by /upload and /upload-multiple
+# and kept below the http_client pool size so uploads never queue on the pool itself
+MAX_CONCURRENT_UPLOADS = 20
+upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+def _storage_path(original_name: str) -> str:
+    """Build a unique storage path for a file, sanitized for Supabase storage"""
+    safe_filename = UNSAFE_FILENAME_RE.sub('_', original_name).strip('_')
+    return f"uploads/{uuid.uuid4().hex}_{safe_filename}"
+
+async def _new_share_id() -> str:
+    """Draw and reserve a random share id not already in use"""
+    share_id = secrets.token_urlsafe(6)
+    while not await reserve_share_id(share_id):
+        share_id = secrets.token_urlsafe(6)
+    return share_id
+
+async def _create_share_link(share_id: str, path: str, original_name: str, size: int, content_type: str) -> dict:
+    """Store the share link for an uploaded file and build the upload response"""
+    public_url = PUBLIC_URL_PREFIX + path
+    share_url = f"https://fileflow-rho.vercel.app/download/{share_id}"
+    
+    await save_link(share_id, {
+        "original_url": public_url,
+        "filename": original_name,
+        "path": path,
+        "created_at": time.time()
+    })
+    
+    return {
+        "ok": True, 
+        "path": path, 
+        "filename": path.rsplit("/", 1)[-1],
+        "original_name": original_name,
+        "size": size,
+        "content_type": content_type,
+        "public_url": public_url,
+        "share_url": share_url,
+        "share_id": share_id,
+        "upload_success": True
+    }
 
 async def upload_single_file(file: UploadFile) -> dict:
     """Upload a single file with optimizations"""
@@ -27,83 +92,55 @@ async def upload_single_file(file: UploadFile) -> dict:
         if file.size and file.size > MAX_FILE_SIZE:
             raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_FILE_SIZE // (1024*1024)}MB")
         
-        # Read file in chunks to avoid memory issues
-        contents = b""
-        chunk_size = 1024 * 1024  # 1MB chunks
-        total_size = 0
-        
-        while chunk := await file.read(chunk_size):
-            total_size += len(chunk)
-            if total_size > MAX_FILE_SIZE:
-                raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_FILE_SIZE // (1024*1024)}MB")
-            contents += chunk
-        
-        if not contents:
+        # Read the first chunk up front so empty files are rejected before touching storage
+        first_chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not first_chunk:
             raise HTTPException(status_code=400, detail="empty file")
+        total_size = 0
+
+        async def file_stream_generator():
+            """Stream the file to storage chunk by chunk, enforcing the size limit as we go"""
+            nonlocal total_size
+            max_file_size = MAX_FILE_SIZE  # local lookup inside the read loop
+            chunk = first_chunk
+            while chunk:
+                total_size += len(chunk)
+                if total_size > max_file_size:
+                    raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_FILE_SIZE // (1024*1024)}MB")
+                yield chunk
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
             
-        # sanitize filename for Supabase storage (remove/replace special chars)
-        import re
-        safe_filename = re.sub(r'[^\w\-_.]', '_', file.filename)
-        safe_filename = re.sub(r'_+', '_', safe_filename)  # replace multiple underscores with single
-        safe_filename = safe_filename.strip('_')  # remove leading/trailing underscores
-        
-        filename = f"{uuid.uuid4().hex}_{safe_filename}"
-        path = f"uploads/{filename}"
+        path = _storage_path(file.filename)
+
+        logger.debug("Uploading file: %s (%s bytes)", path, file.size)
 
-        print(f"Uploading file: {filename} ({total_size} bytes)")
+        # stream straight to the Supabase storage REST API instead of buffering the whole file
+        headers = {
+            "Content-Type": file.content_type or "application/octet-stream",
+            "x-upsert": "false",
+        }
+        if file.size is not None:
+            headers["Content-Length"] = str(file.size)
 
-        # upload via Supabase Python client
-        result = supabase.storage.from_(BUCKET_NAME).upload(
-            path=path,
-            file=contents,
-            file_options={"content-type": file.content_type, "upsert": "false"}
-        )
+        async with upload_semaphore:
+            response = await http_client.post(
+                f"/object/{BUCKET_NAME}/{path}",
+                content=file_stream_generator(),
+                headers=headers,
+            )
 
         # Check if upload was successful
-        if hasattr(result, 'error') and result.error:
-            print(f"Upload error: {result.error}")
-            raise HTTPException(status_code=500, detail=f"Upload failed: {result.error}")
+        if response.status_code >= 400:
+            logger.error("Upload error: %s", response.text)
+            raise HTTPException(status_code=500, detail=f"Upload failed: {response.text}")
 
-        # Get the public URL for the uploaded file
-        try:
-            public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(path)
-        except Exception as e:
-            print(f"Error getting public URL: {e}")
-            public_url = None
-
-        # Generate shareable link
-        share_id = hashlib.md5(f"{filename}_{uuid.uuid4()}".encode()).hexdigest()[:8]
-        share_url = f"https://fileflow-rho.vercel.app/download/{share_id}"
-        
-        # Store mapping
-        share_links[share_id] = {
-            "original_url": public_url,
-            "filename": file.filename,
-            "path": path,
-            "created_at": str(asyncio.get_event_loop().time())
-        }
-        
-        print(f"Created share_id: {share_id}")
-        print(f"Stored in share_links: {share_id in share_links}")
-        print(f"Total share_links after upload: {len(share_links)}")
-        
-        return {
-            "ok": True, 
-            "path": path, 
-            "filename": filename,
-            "original_name": file.filename,
-            "size": total_size,
-            "content_type": file.content_type,
-            "public_url": public_url,
-            "share_url": share_url,
-            "share_id": share_id,
-            "upload_success": True
-        }
+        share_id = await _new_share_id()
+        return await _create_share_link(share_id, path, file.filename, total_size, file.content_type)
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error during upload: {e}")
+        logger.error("Unexpected error during upload: %s", e)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @router.post("/upload")
@@ -111,47 +148,158 @@ async def upload(file: UploadFile = File(...)):
     """Single file upload endpoint"""
     return await upload_single_file(file)
 
+def _take_ownership(file: UploadFile) -> UploadFile:
+    """Move the spooled file behind a form UploadFile into a new UploadFile we close ourselves"""
+    owned = UploadFile(file.file, size=file.size, filename=file.filename, headers=file.headers)
+    file.file = io.BytesIO()  # FastAPI's form cleanup now closes this placeholder instead
+    return owned
+
 @router.post("/upload-multiple")
 async def upload_multiple(files: List[UploadFile] = File(...)):
-    """Multiple file upload endpoint with concurrent processing"""
-    if len(files) > 20:
-        raise HTTPException(status_code=400, detail="Too many files. Max 20 files per batch")
+    """Multiple file upload endpoint, streaming one NDJSON line per file as each upload finishes"""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Max {MAX_BATCH_FILES} files per batch")
+    
+    # FastAPI closes the request's form files as soon as this handler returns, which is
+    # before the streaming body below runs, so keep the uploads alive ourselves
+    owned_files = [_take_ownership(file) for file in files]
+
+    async def upload_result(file: UploadFile) -> dict:
+        try:
+            return await upload_single_file(file)
+        except Exception as e:
+            return {"ok": False, "filename": file.filename, "error": str(e)}
+
+    async def result_stream():
+        # Uploads run concurrently (bounded by the shared upload_semaphore)
+        tasks = [asyncio.create_task(upload_result(file)) for file in owned_files]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result).encode() + b"\n"
+        finally:
+            # Client went away or we're done: stop any pending uploads, then release the files.
+            # On disconnect Starlette cancels this generator, and anyio would cancel every await
+            # in here too, so the cleanup runs shielded to make sure the files always get closed.
+            for task in tasks:
+                task.cancel()
+            with anyio.CancelScope(shield=True):
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for file in owned_files:
+                    await file.close()
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+# How often abandoned direct uploads are looked for
+ABANDONED_UPLOAD_SWEEP_INTERVAL = 10 * 60
+
+async def sweep_abandoned_uploads() -> None:
+    """Delete objects from signed-URL uploads that were never completed.
+
+    The signed URL can't cap what the client sends, and the size check in /upload-complete
+    only runs if the client calls it, so anything left pending past its deadline is removed.
+    """
+    paths = await get_abandoned_uploads()
+    if not paths:
+        return
+
+    # Paths are only forgotten after storage confirms the delete, so failures are retried next sweep
+    response = await http_client.request("DELETE", f"/object/{BUCKET_NAME}", json={"prefixes": paths})
+    if response.status_code >= 400:
+        logger.error("Abandoned upload cleanup error: %s", response.text)
+        return
+
+    await remove_abandoned_uploads(paths)
+    logger.debug("Deleted abandoned uploads: %s", paths)
+
+async def sweep_abandoned_uploads_forever() -> None:
+    """Run sweep_abandoned_uploads every ABANDONED_UPLOAD_SWEEP_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(ABANDONED_UPLOAD_SWEEP_INTERVAL)
+        try:
+            await sweep_abandoned_uploads()
+        except Exception as e:
+            logger.error("Unexpected error sweeping abandoned uploads: %s", e)
+
+@router.post("/upload-url")
+async def create_upload_url(request: UploadUrlRequest):
+    """Create a signed URL the client can PUT the file to directly, bypassing this server"""
+    if request.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_FILE_SIZE // (1024*1024)}MB")
+    if request.size <= 0:
+        raise HTTPException(status_code=400, detail="empty file")
     
     try:
-        # Process files concurrently with semaphore to limit concurrent uploads
-        semaphore = asyncio.Semaphore(5)  # Max 5 concurrent uploads
+        path = _storage_path(request.filename)
+        response = await http_client.post(f"/object/upload/sign/{BUCKET_NAME}/{path}")
+        if response.status_code >= 400:
+            logger.error("Signed upload URL error: %s", response.text)
+            raise HTTPException(status_code=500, detail=f"Upload failed: {response.text}")
         
-        async def upload_with_semaphore(file: UploadFile):
-            async with semaphore:
-                return await upload_single_file(file)
+        # The share link is only created once the client reports the upload as done
+        share_id = await _new_share_id()
+        await save_pending_upload(share_id, {
+            "path": path,
+            "filename": request.filename,
+            "content_type": request.content_type
+        })
         
-        # Upload all files concurrently
-        results = await asyncio.gather(
-            *[upload_with_semaphore(file) for file in files],
-            return_exceptions=True
-        )
+        return {
+            "url": f"{http_client.base_url}{response.json()['url'].lstrip('/')}",
+            "path": path,
+            "share_id": share_id
+        }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error creating upload URL: %s", e)
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+async def _discard_upload(share_id: str, path: str) -> None:
+    """Delete a rejected signed-URL upload from storage and forget its pending entry"""
+    response = await http_client.delete(f"/object/{BUCKET_NAME}/{path}")
+    if response.status_code >= 400:
+        # Keep the pending entry so the abandoned upload sweep retries the delete
+        logger.error("Rejected upload delete error: %s", response.text)
+        return
+    await delete_pending_upload(share_id, path)
+
+@router.post("/upload-complete")
+async def complete_upload(request: UploadCompleteRequest):
+    """Create the share link for a file uploaded through a signed URL"""
+    pending = await get_pending_upload(request.share_id)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    
+    try:
+        path = pending["path"]
         
-        successful_uploads = []
-        failed_uploads = []
+        # Make sure the file actually reached storage, and check its real size
+        # since the signed URL itself doesn't limit what the client sends
+        response = await http_client.head(f"/object/authenticated/{BUCKET_NAME}/{path}")
+        if response.status_code >= 400:
+            raise HTTPException(status_code=400, detail="File has not been uploaded")
         
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                failed_uploads.append({
-                    "filename": files[i].filename,
-                    "error": str(result)
-                })
-            else:
-                successful_uploads.append(result)
+        # Without a size the limits can't be enforced, so leave the upload pending; the client
+        # can retry, and the abandoned upload sweep deletes it if it never completes
+        if "content-length" not in response.headers:
+            logger.error("Uploaded file has no content-length: %s", path)
+            raise HTTPException(status_code=500, detail="Upload failed: could not determine file size")
         
-        return {
-            "successful_uploads": successful_uploads,
-            "failed_uploads": failed_uploads,
-            "total_files": len(files),
-            "successful_count": len(successful_uploads),
-            "failed_count": len(failed_uploads)
-        }
+        size = int(response.headers["content-length"])
+        if size == 0:
+            await _discard_upload(request.share_id, path)
+            raise HTTPException(status_code=400, detail="empty file")
+        if size > MAX_FILE_SIZE:
+            await _discard_upload(request.share_id, path)
+            raise HTTPException(status_code=413, detail=f"File too large. Max size: {MAX_FILE_SIZE // (1024*1024)}MB")
         
+        result = await _create_share_link(request.share_id, path, pending["filename"], size, pending["content_type"] or None)
+        await delete_pending_upload(request.share_id, path)
+        return result
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Unexpected error during batch upload: {e}")
-        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+        logger.error("Unexpected error completing upload: %s", e)
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
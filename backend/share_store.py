@@ -0,0 +1,199 @@
+# share_store.py
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from clients import redis
+
+# Share links expire after 7 days
+SHARE_LINK_TTL = 7 * 24 * 60 * 60
+
+# Uploads handed out as signed URLs stay pending while the client uploads directly
+# to storage; Supabase signed upload URLs are valid for 2 hours
+PENDING_UPLOAD_TTL = 2 * 60 * 60
+
+# Objects from direct uploads that were never completed are deleted this long after their
+# pending entry expires, leaving time for a PUT that started just before the URL expired
+ABANDONED_UPLOAD_GRACE = 60 * 60
+
+# A share id stays reserved for as long as either its pending upload or its link can exist
+SHARE_ID_RESERVATION_TTL = PENDING_UPLOAD_TTL + SHARE_LINK_TTL
+
+# Max entries kept per in-memory fallback store; the oldest are evicted first
+MAX_LINKS = 100_000
+
+# Redis is shared by every uvicorn worker, so a link created on one worker resolves on all of them.
+# Without REDIS_URL we fall back to this per-process dict, which is only correct for a single worker.
+# share_id -> (expires_at, data), in insertion order. Every link gets the same TTL,
+# so insertion order is also expiry order and expired links are always at the front.
+# pending_uploads follows the same layout with PENDING_UPLOAD_TTL.
+share_links = OrderedDict()
+pending_uploads = OrderedDict()
+
+# Storage paths of pending uploads -> time.time() after which the object counts as abandoned.
+# In Redis this is a sorted set scored by that deadline.
+abandoned_upload_deadlines = OrderedDict()
+ABANDONED_UPLOADS_KEY = "pending-paths"
+
+def _key(share_id: str) -> str:
+    return f"share:{share_id}"
+
+def _pending_key(share_id: str) -> str:
+    return f"pending:{share_id}"
+
+def _reserved_key(share_id: str) -> str:
+    return f"share-id:{share_id}"
+
+def _memory_save(store: OrderedDict, key: str, data: dict, ttl: int) -> None:
+    """Insert into an in-memory store, evicting expired entries and any over MAX_LINKS"""
+    now = time.monotonic()
+    store[key] = (now + ttl, data)
+    store.move_to_end(key)
+    while store and (len(store) > MAX_LINKS or next(iter(store.values()))[0] <= now):
+        store.popitem(last=False)
+
+def _memory_get(store: OrderedDict, key: str) -> Optional[dict]:
+    """Look up an in-memory store entry, dropping it if it has expired"""
+    entry = store.get(key)
+    if entry is None:
+        return None
+    expires_at, data = entry
+    if expires_at <= time.monotonic():
+        del store[key]
+        return None
+    return data
+
+async def _redis_save(key: str, data: dict, ttl: int, zadd: Optional[Tuple[str, dict]] = None) -> None:
+    """Store data as a Redis hash that expires after ttl seconds.
+
+    zadd is an optional (key, {member: score}) added to a sorted set in the same transaction.
+    """
+    # Redis hashes only hold strings, so a missing value is stored as ""
+    mapping = {field: "" if value is None else value for field, value in data.items()}
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, ttl)
+        if zadd is not None:
+            pipe.zadd(*zadd)
+        await pipe.execute()
+
+def _from_redis(data: dict) -> dict:
+    """Undo the string-only encoding applied by save_link"""
+    data["original_url"] = data.get("original_url") or None
+    data["created_at"] = float(data["created_at"])
+    return data
+
+async def save_link(share_id: str, data: dict) -> None:
+    """Store share link data under share_id"""
+    if redis is None:
+        _memory_save(share_links, share_id, data, SHARE_LINK_TTL)
+        return
+
+    # created_at is converted back to a float on read
+    await _redis_save(_key(share_id), data, SHARE_LINK_TTL)
+
+async def get_link(share_id: str) -> Optional[dict]:
+    """Return share link data for share_id, or None if it doesn't exist"""
+    if redis is None:
+        return _memory_get(share_links, share_id)
+
+    data = await redis.hgetall(_key(share_id))
+    if not data:
+        return None
+    return _from_redis(data)
+
+async def get_links(share_ids: List[str]) -> Dict[str, dict]:
+    """Return share link data for each of share_ids that exists (one Redis round trip)"""
+    if redis is None:
+        links = {}
+        for share_id in share_ids:
+            data = await get_link(share_id)
+            if data is not None:
+                links[share_id] = data
+        return links
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for share_id in share_ids:
+            pipe.hgetall(_key(share_id))
+        results = await pipe.execute()
+    return {share_id: _from_redis(data) for share_id, data in zip(share_ids, results) if data}
+
+async def delete_link(share_id: str) -> None:
+    """Remove share link data for share_id"""
+    await delete_links([share_id])
+
+async def delete_links(share_ids: List[str]) -> None:
+    """Remove share link data for every share_id in share_ids"""
+    if redis is None:
+        for share_id in share_ids:
+            share_links.pop(share_id, None)
+        return
+
+    if share_ids:
+        await redis.delete(*[_key(share_id) for share_id in share_ids])
+
+async def reserve_share_id(share_id: str) -> bool:
+    """Claim share_id for a new link or pending upload; False if it's already taken"""
+    if redis is None:
+        return share_id not in share_links and share_id not in pending_uploads
+
+    # SET NX claims the id atomically in a single round trip, across all workers
+    return bool(await redis.set(_reserved_key(share_id), 1, nx=True, ex=SHARE_ID_RESERVATION_TTL))
+
+async def save_pending_upload(share_id: str, data: dict) -> None:
+    """Remember an upload handed out as a signed URL until the client completes it"""
+    deadline = time.time() + PENDING_UPLOAD_TTL + ABANDONED_UPLOAD_GRACE
+    if redis is None:
+        _memory_save(pending_uploads, share_id, data, PENDING_UPLOAD_TTL)
+        abandoned_upload_deadlines[data["path"]] = deadline
+        return
+
+    await _redis_save(
+        _pending_key(share_id), data, PENDING_UPLOAD_TTL,
+        zadd=(ABANDONED_UPLOADS_KEY, {data["path"]: deadline}),
+    )
+
+async def get_pending_upload(share_id: str) -> Optional[dict]:
+    """Return pending upload data for share_id, or None if it doesn't exist"""
+    if redis is None:
+        return _memory_get(pending_uploads, share_id)
+
+    data = await redis.hgetall(_pending_key(share_id))
+    return data or None
+
+async def delete_pending_upload(share_id: str, path: str) -> None:
+    """Forget the pending upload for share_id, so its object is no longer swept"""
+    if redis is None:
+        pending_uploads.pop(share_id, None)
+        abandoned_upload_deadlines.pop(path, None)
+        return
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(_pending_key(share_id))
+        pipe.zrem(ABANDONED_UPLOADS_KEY, path)
+        await pipe.execute()
+
+async def get_abandoned_uploads() -> List[str]:
+    """Return the storage paths of pending uploads past their deadline"""
+    now = time.time()
+    if redis is None:
+        # Every pending upload gets the same deadline offset, so the oldest are at the front
+        paths = []
+        for path, deadline in abandoned_upload_deadlines.items():
+            if deadline > now:
+                break
+            paths.append(path)
+        return paths
+
+    return await redis.zrangebyscore(ABANDONED_UPLOADS_KEY, "-inf", now)
+
+async def remove_abandoned_uploads(paths: List[str]) -> None:
+    """Stop tracking paths once their objects have been deleted from storage"""
+    if redis is None:
+        for path in paths:
+            abandoned_upload_deadlines.pop(path, None)
+        return
+
+    # Paths stay in the set until storage confirms the delete, so a failed delete is retried
+    # on the next sweep. Two workers sweeping at once may both delete a path, which is harmless.
+    if paths:
+        await redis.zrem(ABANDONED_UPLOADS_KEY, *paths)
@@ -55,7 +55,12 @@ export default function Home() {
         // Batch upload - much faster for multiple files
         setUploadProgress(20); 
         
-        const batchResult = await apiService.uploadMultipleFiles(files);
+        // Advance the progress bar as each file's result streams in
+        let completed = 0;
+        const batchResult = await apiService.uploadMultipleFiles(files, () => {
+          completed += 1;
+          setUploadProgress(20 + Math.round((completed / files.length) * 80));
+        });
         uploadedFilesData = apiService.createFileDataFromBatch(files, batchResult);
         
         // Log results for debugging
@@ -71,7 +76,8 @@ export default function Home() {
         setUploadProgress(50);
         
         try {
-          const uploadResult = await apiService.uploadFile(file);
+          // Upload straight to storage through a signed URL; the backend never sees the bytes
+          const uploadResult = await apiService.uploadFileDirect(file);
           const fileData = apiService.createFileData(file, uploadResult);
           uploadedFilesData.push(fileData);
         } catch (error) {
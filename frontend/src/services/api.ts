@@ -16,9 +16,18 @@ export interface UploadResponse {
   upload_success: boolean;
 }
 
+export interface FailedUpload {
+  ok: false;
+  filename: string;
+  error: string;
+}
+
+// One line of the /upload-multiple NDJSON stream
+export type BatchUploadResult = UploadResponse | FailedUpload;
+
 export interface BatchUploadResponse {
   successful_uploads: UploadResponse[];
-  failed_uploads: { filename: string; error: string }[];
+  failed_uploads: FailedUpload[];
   total_files: number;
   successful_count: number;
   failed_count: number;
@@ -39,7 +48,7 @@ export interface SharedFile {
   share_url: string;
   original_url: string;
   filename: string;
-  created_at: string;
+  created_at: number;
 }
 
 class ApiService {
@@ -71,7 +80,56 @@ class ApiService {
     }
   }
 
-  async uploadMultipleFiles(files: File[]): Promise<BatchUploadResponse> {
+  // Upload straight to Supabase storage through a signed URL, so the file
+  // bytes never pass through the backend; the backend only registers the share link
+  async uploadFileDirect(file: File): Promise<UploadResponse> {
+    try {
+      const urlResponse = await fetch(`${this.baseUrl}/upload-url`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type || null }),
+      });
+
+      if (!urlResponse.ok) {
+        throw new Error(`Upload failed: ${urlResponse.statusText}`);
+      }
+
+      const { url, share_id } = await urlResponse.json();
+
+      const putResponse = await fetch(url, {
+        method: 'PUT',
+        headers: { 'Content-Type': file.type || 'application/octet-stream' },
+        body: file,
+      });
+
+      if (!putResponse.ok) {
+        throw new Error(`Upload failed: ${putResponse.statusText}`);
+      }
+
+      const completeResponse = await fetch(`${this.baseUrl}/upload-complete`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ share_id }),
+      });
+
+      if (!completeResponse.ok) {
+        throw new Error(`Upload failed: ${completeResponse.statusText}`);
+      }
+
+      const result = await completeResponse.json();
+      return result;
+    } catch (error) {
+      console.error('Direct upload error:', error);
+      throw error;
+    }
+  }
+
+  // The backend streams one JSON line per file as each upload finishes;
+  // onResult is called for every line, the aggregated response is returned at the end
+  async uploadMultipleFiles(
+    files: File[],
+    onResult?: (result: BatchUploadResult) => void
+  ): Promise<BatchUploadResponse> {
     const formData = new FormData();
     files.forEach(file => {
       formData.append('files', file);
@@ -83,12 +141,44 @@ class ApiService {
         body: formData,
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`Batch upload failed: ${response.statusText}`);
       }
 
-      const result = await response.json();
-      return result;
+      const batchResult: BatchUploadResponse = {
+        successful_uploads: [],
+        failed_uploads: [],
+        total_files: files.length,
+        successful_count: 0,
+        failed_count: 0,
+      };
+
+      const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const result: BatchUploadResult = JSON.parse(line);
+        if ('error' in result) {
+          batchResult.failed_uploads.push(result);
+        } else {
+          batchResult.successful_uploads.push(result);
+        }
+        onResult?.(result);
+      };
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffered = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += value;
+        const lines = buffered.split('\n');
+        buffered = lines.pop() ?? '';
+        lines.forEach(handleLine);
+      }
+      handleLine(buffered);
+
+      batchResult.successful_count = batchResult.successful_uploads.length;
+      batchResult.failed_count = batchResult.failed_uploads.length;
+      return batchResult;
     } catch (error) {
       console.error('Batch upload error:', error);
       throw error;